@@ -1,62 +1,145 @@
 import argparse
-from core import SimpleVCS
+from core import SimpleVCS, BranchNotFoundError, RepositoryNotEmptyError
+from storage import INTERNAL_NAMES, RepositoryNotFoundError
+from watcher import Watcher
+from itertools import islice
 import os
 
 def main():
     parser = argparse.ArgumentParser(description="Simple VCS")
     parser.add_argument('command', choices=[
-        'init', 'add', 'commit', 'log', 'branch', 'checkout', 'merge', 'reset', 'help', 'h', 
+        'init', 'add', 'commit', 'log', 'branch', 'checkout', 'merge', 'reset', 'fsck', 'clone', 'blame', 'status', 'watch', 'help', 'h', 
         'mkdir', 'create_file', 'rm', 'cd', 'ls'], help="Command to execute")
     parser.add_argument('repo_dir', help="Repository directory")
     parser.add_argument('name', nargs='?', help="Branch name, commit message, or file/directory name")
     parser.add_argument('source', nargs='?', help="Source branch for merge command")
     parser.add_argument('-m', '--message', help="Commit message")
+    parser.add_argument('-n', '--max-count', type=int, help="Limit the number of commits shown by log")
+    parser.add_argument('--incremental', action='store_true', help="Only rehash objects added since the last fsck")
+    parser.add_argument('-j', '--jobs', type=int, help="Number of parallel fsck workers")
+    parser.add_argument('--depth', type=int, help="Only clone the last N commits of each branch")
+    parser.add_argument('--partial', action='store_true', help="Fetch file contents from the source repository on demand")
     args = parser.parse_args()
 
     vcs = SimpleVCS(args.repo_dir)
 
     if args.command == 'init':
-        vcs.init_repo()
+        print(f"Repository initialized in {args.repo_dir}")
 
     elif args.command == 'add':
         if args.name:
-            vcs.add(args.name.split())
+            staged = vcs.add(args.name.split())
         else:
-            vcs.add('.')
+            staged = vcs.add('.')
+        print(f"Added files to staging: {sorted(staged)}")
 
     elif args.command == 'commit':
         if args.message:
-            vcs.commit(args.message)
+            commit = vcs.commit(args.message)
+            print(f'Committed with hash {commit.hash}')
         else:
             print("Commit message is required.")
 
     elif args.command == 'log':
-        vcs.list_commits()
+        if args.name:
+            commits = vcs.iter_path_commits(args.name)
+        else:
+            commits = vcs.iter_commits()
+        for commit in islice(commits, args.max_count):
+            print(f"{commit.hash} - {commit.message}")
 
     elif args.command == 'branch':
         if args.name:
-            vcs.create_branch(args.name)
+            if vcs.create_branch(args.name):
+                print(f"Branch '{args.name}' created.")
+            else:
+                print(f"Branch '{args.name}' already exists.")
         else:
             print("Branch name is required.")
 
     elif args.command == 'checkout':
         if args.name:
-            vcs.checkout(args.name)
+            try:
+                vcs.checkout(args.name)
+                print(f"Switched to branch '{args.name}'")
+            except BranchNotFoundError as e:
+                print(e)
         else:
             print("Branch name is required.")
 
     elif args.command == 'merge':
         if args.source:
-            vcs.merge(args.source)
+            try:
+                result = vcs.merge(args.source)
+            except BranchNotFoundError as e:
+                print(f"Source branch '{e.branch_name}' does not exist.")
+                return
+            if result.conflicts:
+                print("Merge conflicts detected!")
+                for conflict in result.conflicts:
+                    print(conflict)
+            else:
+                print(f"Branch '{result.source}' merged into '{result.target}' successfully.")
         else:
             print("Source branch name is required.")
 
     elif args.command == 'reset':
         if args.name:
-            vcs.reset_to_commit(args.name)
+            branch = vcs.reset_to_commit(args.name)
+            print(f"Branch '{branch}' reset to commit '{args.name}'")
         else:
             print("Commit hash is required.")
 
+    elif args.command == 'clone':
+        if not args.name:
+            print("Source repository is required.")
+        elif args.depth is not None and args.depth < 1:
+            print("Clone depth must be at least 1.")
+        else:
+            try:
+                kept = vcs.clone_from(args.name, depth=args.depth, partial=args.partial)
+            except RepositoryNotEmptyError as e:
+                print(e)
+                return
+            print(f"Cloned {len(kept)} commits from '{args.name}'.")
+
+    elif args.command == 'blame':
+        if args.name:
+            for line in vcs.blame(args.name):
+                print(f"{line.commit[:8]} {line.line_number:>4}) {line.text}")
+        else:
+            print("File name is required.")
+
+    elif args.command == 'status':
+        report = vcs.status()
+        for path in report.staged:
+            print(f"staged:    {path}")
+        for path in report.modified:
+            print(f"modified:  {path}")
+        for path in report.untracked:
+            print(f"untracked: {path}")
+
+    elif args.command == 'watch':
+        print(f"Watching '{args.repo_dir}' for changes (Ctrl-C to stop).")
+        try:
+            Watcher(args.repo_dir, ignored=INTERNAL_NAMES).run()
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(e)
+
+    elif args.command == 'fsck':
+        report = vcs.fsck(incremental=args.incremental, workers=args.jobs)
+        for obj_hash, referrer in report.missing:
+            print(f"missing {obj_hash} (referenced by {referrer})")
+        for obj_hash in report.corrupt:
+            print(f"corrupt {obj_hash}")
+        for obj_hash in report.dangling:
+            print(f"dangling {obj_hash}")
+        for obj_hash in report.unknown:
+            print(f"unknown {obj_hash} (possibly referenced by a corrupt commit)")
+        print(f"Checked {report.checked} objects.")
+
     elif args.command in ['help', 'h']:
         parser.print_help()
 
@@ -102,4 +185,7 @@ def main():
             print(entry)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except RepositoryNotFoundError as e:
+        print(e)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import struct
+from records import OID_SIZE, to_oid
+
+# Each record in the commit-graph file (big-endian):
+#   oid:20 | parent_count:u8 | parent_count * parent:20 | num_hashes:u8
+#   | bloom_len:u16 | bloom
+# The filter holds the paths changed against the first parent. A bloom_len of
+# 0 marks a commit that changed too many paths to index; it matches every path.
+BITS_PER_PATH = 10
+NUM_HASHES = 7
+MAX_INDEXED_PATHS = 512
+MAX_PENDING_PARENTS = 256
+
+_HEADER = struct.Struct('>B')
+_BLOOM_HEADER = struct.Struct('>BH')
+
+
+class BloomFilter:
+    __slots__ = ('bits', 'num_hashes')
+
+    def __init__(self, bits=b'', num_hashes=NUM_HASHES):
+        self.bits = bits
+        self.num_hashes = num_hashes
+
+    @classmethod
+    def from_paths(cls, paths):
+        paths = list(paths)
+        if len(paths) > MAX_INDEXED_PATHS:
+            return cls()
+        size = max(8, (len(paths) * BITS_PER_PATH + 7) // 8)
+        bits = bytearray(size)
+        for path in paths:
+            for index in cls.positions(path, size * 8, NUM_HASHES):
+                bits[index >> 3] |= 1 << (index & 7)
+        return cls(bytes(bits))
+
+    @staticmethod
+    def positions(path, num_bits, num_hashes):
+        digest = hashlib.blake2b(path.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % num_bits for i in range(num_hashes)]
+
+    def might_contain(self, path):
+        if not self.bits:
+            return True
+        for index in self.positions(path, len(self.bits) * 8, self.num_hashes):
+            if not self.bits[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
+
+
+class GraphEntry:
+    __slots__ = ('parent_oids', 'bloom')
+
+    def __init__(self, parent_oids, bloom):
+        self.parent_oids = tuple(parent_oids)
+        self.bloom = bloom
+
+    @property
+    def parents(self):
+        return [oid.hex() for oid in self.parent_oids]
+
+
+class CommitGraph:
+    def __init__(self, storage):
+        self.storage = storage
+        self.graph_file = os.path.join(storage.repo_dir, 'commit-graph')
+        self.entries = None
+        # Parents loaded while indexing a commit; a history walk asks for them
+        # next, so they are handed over instead of being read again.
+        self.pending_parents = {}
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.graph_file):
+            return
+        with open(self.graph_file, 'rb') as f:
+            data = memoryview(f.read())
+        offset = 0
+        complete = 0
+        while offset + OID_SIZE + _HEADER.size <= len(data):
+            oid = bytes(data[offset:offset + OID_SIZE])
+            offset += OID_SIZE
+            (parent_count,) = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            if offset + parent_count * OID_SIZE + _BLOOM_HEADER.size > len(data):
+                break
+            parent_oids = []
+            for _ in range(parent_count):
+                parent_oids.append(bytes(data[offset:offset + OID_SIZE]))
+                offset += OID_SIZE
+            num_hashes, bloom_len = _BLOOM_HEADER.unpack_from(data, offset)
+            offset += _BLOOM_HEADER.size
+            if offset + bloom_len > len(data):
+                break
+            bloom = BloomFilter(bytes(data[offset:offset + bloom_len]), num_hashes)
+            offset += bloom_len
+            self.entries[oid] = GraphEntry(parent_oids, bloom)
+            complete = offset
+        if complete < len(data):
+            # Drop a record cut short by an interrupted append so new records
+            # line up again; the missing commit is re-indexed on demand.
+            with open(self.graph_file, 'r+b') as f:
+                f.truncate(complete)
+
+    def get(self, commit_hash):
+        if self.entries is None:
+            self.load()
+        oid = to_oid(commit_hash)
+        commit = self.pending_parents.pop(commit_hash, None)
+        entry = self.entries.get(oid)
+        if entry is None:
+            if commit is None:
+                commit = self.storage.load_commit(commit_hash)
+            parent = None
+            # A shallow commit's parents were cut off by the clone; fetching
+            # them from a mirror would pull in history the clone left out.
+            shallow = commit_hash in self.storage.load_shallow()
+            if commit.parent and not shallow and self.storage.has_object(commit.parent):
+                parent = self.storage.load_commit(commit.parent)
+                if len(self.pending_parents) >= MAX_PENDING_PARENTS:
+                    self.pending_parents.clear()
+                self.pending_parents[commit.parent] = parent
+            entry = self.add(commit, parent)
+        return entry
+
+    def add(self, commit, parent=None):
+        if self.entries is None:
+            self.load()
+        entry = self.entries.get(commit.oid)
+        if entry is not None:
+            return entry
+        entry = GraphEntry(commit.parent_oids, BloomFilter.from_paths(changed_paths(commit, parent)))
+        self.entries[commit.oid] = entry
+        parts = [commit.oid, _HEADER.pack(len(commit.parent_oids))]
+        parts.extend(commit.parent_oids)
+        parts.append(_BLOOM_HEADER.pack(entry.bloom.num_hashes, len(entry.bloom.bits)))
+        parts.append(entry.bloom.bits)
+        with open(self.graph_file, 'ab') as f:
+            f.write(b''.join(parts))
+        return entry
+
+
+def changed_paths(commit, parent=None):
+    for path, oid in commit.tree.items():
+        if parent is None or parent.tree.get(path) != oid:
+            yield path
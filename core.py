@@ -1,37 +1,63 @@
 from storage import Storage
+from records import Commit, Tree, to_oid
+from commit_graph import CommitGraph
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
 import os
+import struct
+import time
+import zlib
+
+MergeResult = namedtuple('MergeResult', ['commit', 'source', 'target', 'conflicts'])
+FsckReport = namedtuple('FsckReport', ['checked', 'missing', 'corrupt', 'dangling', 'unknown'])
+BlameLine = namedtuple('BlameLine', ['commit', 'line_number', 'text'])
+StatusReport = namedtuple('StatusReport', ['staged', 'modified', 'untracked'])
+
+
+class BranchNotFoundError(Exception):
+    def __init__(self, branch_name):
+        super().__init__(f"Branch '{branch_name}' does not exist.")
+        self.branch_name = branch_name
+
+
+class RepositoryNotEmptyError(Exception):
+    def __init__(self, repo_dir):
+        super().__init__(f"Repository '{repo_dir}' already has commits; clone into an empty one.")
+        self.repo_dir = repo_dir
+
 
 class SimpleVCS:
     def __init__(self, repo_dir):
         self.repo_dir = repo_dir
         self.storage = Storage(repo_dir)
+        self.commit_graph = CommitGraph(self.storage)
         self.current_branch_file = os.path.join(repo_dir, 'HEAD')
+        self.fsck_checkpoint_file = os.path.join(repo_dir, 'fsck_checkpoint')
         self.init_repo()
 
     def init_repo(self):
-        if not os.path.exists(self.current_branch_file):
+        created = not os.path.exists(self.current_branch_file)
+        if created:
             with open(self.current_branch_file, 'w') as f:
                 f.write('main')
         self.create_branch('main')
-        print(f"Repository initialized in {self.repo_dir}")
+        return created
 
     def create_branch(self, branch_name):
-        if not self.branch_exists(branch_name):
-            self.storage.save_branch(branch_name, self.get_latest_commit())
-            print(f"Branch '{branch_name}' created.")
-        else:
-            print(f"Branch '{branch_name}' already exists.")
+        if self.branch_exists(branch_name):
+            return False
+        self.storage.save_branch(branch_name, self.get_latest_commit())
+        return True
 
     def branch_exists(self, branch_name):
         branch_path = os.path.join(self.storage.branches_dir, branch_name)
         return os.path.exists(branch_path)
 
     def checkout(self, branch_name):
-        if self.branch_exists(branch_name):
-            self.set_current_branch(branch_name)
-            print(f"Switched to branch '{branch_name}'")
-        else:
-            print(f"Branch '{branch_name}' does not exist.")
+        if not self.branch_exists(branch_name):
+            raise BranchNotFoundError(branch_name)
+        self.set_current_branch(branch_name)
 
     def set_current_branch(self, branch_name):
         with open(self.current_branch_file, 'w') as f:
@@ -41,6 +67,9 @@ class SimpleVCS:
         with open(self.current_branch_file, 'r') as f:
             return f.read().strip()
 
+    def head_state(self):
+        return self.get_current_branch(), self.get_latest_commit()
+
     def get_latest_commit(self):
         current_branch = self.get_current_branch()
         return self.storage.load_branch(current_branch)
@@ -48,26 +77,26 @@ class SimpleVCS:
     def merge(self, source_branch):
         target_branch = self.get_current_branch()
         if not self.branch_exists(source_branch):
-            print(f"Source branch '{source_branch}' does not exist.")
-            return
+            raise BranchNotFoundError(source_branch)
 
         source_commit = self.storage.load_branch(source_branch)
         target_commit = self.storage.load_branch(target_branch)
 
-        source_tree = self.storage.load_commit(source_commit)
-        target_tree = self.storage.load_commit(target_commit)
+        source_tree = self.storage.load_commit(source_commit) if source_commit else Commit('')
+        target_tree = self.storage.load_commit(target_commit) if target_commit else Commit('')
 
-        merged_tree, conflicts = self.merge_trees(source_tree, target_tree)
+        merged_tree, conflicts = self.merge_trees(source_tree.files, target_tree.files)
 
         if conflicts:
-            print("Merge conflicts detected!")
-            for conflict in conflicts:
-                print(conflict)
-            return
+            return MergeResult(None, source_branch, target_branch, conflicts)
 
-        merged_commit_hash = self.storage.save_commit(merged_tree)
+        parents = [commit_hash for commit_hash in dict.fromkeys([target_commit, source_commit]) if commit_hash]
+        merged_commit = Commit(f"Merge branch '{source_branch}' into '{target_branch}'",
+                               [to_oid(commit_hash) for commit_hash in parents], Tree.from_dict(merged_tree))
+        merged_commit_hash = self.storage.save_commit(merged_commit)
+        self.commit_graph.add(merged_commit, target_tree if target_commit else None)
         self.storage.save_branch(target_branch, merged_commit_hash)
-        print(f"Branch '{source_branch}' merged into '{target_branch}' successfully.")
+        return MergeResult(merged_commit_hash, source_branch, target_branch, [])
 
     def merge_trees(self, source_tree, target_tree):
         merged_tree = {}
@@ -87,30 +116,309 @@ class SimpleVCS:
         return merged_tree, conflicts
 
     def add(self, files):
-        self.storage.add_to_staging(files)
-        print(f"Added files to staging: {files}")
+        return self.storage.add_to_staging(files, self.head_state())
+
+    def status(self):
+        staged = self.storage.get_staging_files()
+        state = self.head_state()
+        position = self.storage.watch.journal_position()
+        dirty = self.storage.watch.dirty_paths(state)
+        if dirty is None:
+            paths = self.storage.list_working_files()
+            tracked = {}
+            unresolved = set(paths)
+            for commit in self.iter_commits():
+                for path in list(unresolved):
+                    oid = commit.tree.get(path)
+                    if oid is not None:
+                        tracked[path] = oid.hex()
+                        unresolved.discard(path)
+                if not unresolved:
+                    break
+        else:
+            paths = [path for path in sorted(dirty) if os.path.isfile(os.path.join(self.repo_dir, path))]
+            head = state[1]
+            tracked = self.storage.watch.load_tracked(head)
+            unresolved = [path for path in paths if path not in tracked]
+            if unresolved:
+                tracked.update(self.latest_versions(unresolved))
+                self.storage.watch.save_tracked(head, tracked)
+
+        modified = []
+        untracked = []
+        for path in paths:
+            known = staged.get(path, tracked.get(path))
+            if known is None:
+                untracked.append(path)
+            elif not self.storage.file_matches(os.path.join(self.repo_dir, path), known):
+                modified.append(path)
+        # Paths that turned out clean no longer need to be looked at.
+        if dirty is None:
+            self.storage.watch.mark_scanned(position, modified + untracked, state)
+        else:
+            self.storage.watch.save_dirty(modified + untracked)
+        return StatusReport(sorted(staged), sorted(modified), sorted(untracked))
+
+    def latest_versions(self, paths, start=None):
+        # One walk for all paths; the Bloom filters skip commits that cannot
+        # hold any of them and the walk ends once every path is found.
+        versions = dict.fromkeys(paths)
+        unresolved = set(paths)
+        for commit_hash, entry in self.walk_history(start, self.commit_graph.get):
+            candidates = [path for path in unresolved if entry.bloom.might_contain(path)]
+            if candidates:
+                commit = self.storage.load_commit(commit_hash)
+                for path in candidates:
+                    file_hash = commit.tree.get(path)
+                    if file_hash is not None:
+                        versions[path] = file_hash.hex()
+                        unresolved.discard(path)
+            if not unresolved:
+                break
+        return versions
 
     def commit(self, message):
         staged_files = self.storage.get_staging_files()
-        commit_data = {
-            'message': message,
-            'parent': self.get_latest_commit(),
-            'files': staged_files
-        }
-        commit_hash = self.storage.save_commit(commit_data)
+        parent_hash = self.get_latest_commit()
+        commit = Commit(message, [to_oid(parent_hash)] if parent_hash else [], Tree.from_dict(staged_files))
+        commit_hash = self.storage.save_commit(commit)
+        self.commit_graph.add(commit, self.storage.load_commit(parent_hash) if parent_hash else None)
         current_branch = self.get_current_branch()
         self.storage.save_branch(current_branch, commit_hash)
         self.storage.clear_staging()
-        print(f'Committed with hash {commit_hash}')
+        self.storage.watch.advance_head((current_branch, parent_hash), (current_branch, commit_hash))
+        return commit
+
+    def walk_history(self, start, load):
+        # Breadth-first over every parent so both sides of a merge are listed,
+        # newest generations first. load(hash) returns an object with .parents.
+        shallow = self.storage.load_shallow()
+        seen = set()
+        pending = deque([start or self.get_latest_commit()])
+        while pending:
+            commit_hash = pending.popleft()
+            if not commit_hash or commit_hash in seen:
+                continue
+            seen.add(commit_hash)
+            node = load(commit_hash)
+            yield commit_hash, node
+            if commit_hash not in shallow:
+                pending.extend(node.parents)
+
+    def iter_commits(self, start=None):
+        for _, commit in self.walk_history(start, self.storage.load_commit):
+            yield commit
+
+    def iter_path_commits(self, path, start=None):
+        # The commit graph lets us follow parents and rule out commits whose
+        # Bloom filter says the path was not changed without loading them.
+        shallow = self.storage.load_shallow()
+        for commit_hash, entry in self.walk_history(start, self.commit_graph.get):
+            if not entry.bloom.might_contain(path):
+                continue
+            commit = self.storage.load_commit(commit_hash)
+            file_hash = commit.tree.get(path)
+            if file_hash is None:
+                continue
+            parents = [] if commit_hash in shallow else entry.parents
+            # Like a merge that keeps one side's version unchanged, a commit
+            # only counts if the path differs from every parent.
+            if all(self.storage.load_commit(parent).tree.get(path) != file_hash for parent in parents):
+                yield commit
+
+    def blame(self, path, start=None):
+        head = self.nearest_version(path, start or self.get_latest_commit())
+        if head is None:
+            return []
+        shallow = self.storage.load_shallow()
+        contents = {}
+        links = {}
+        lines = self.version_lines(path, head, contents)
+        owners = [None] * len(lines)
+        # Each entry pairs a version with (line of the head version, position
+        # in that version) for the lines still being traced through it.
+        pending = [(head, list(enumerate(range(len(lines)))))]
+        while pending:
+            commit, tracked = pending.pop()
+            if commit.hash not in links:
+                links[commit.hash] = self.blame_parents(path, commit, shallow, contents)
+            parents = links[commit.hash]
+            forwarded = [[] for _ in parents]
+            for line, position in tracked:
+                # A line comes from the first parent that has it, as long as
+                # its position survives the diff against that parent.
+                for index, (_, mapping) in enumerate(parents):
+                    if position in mapping:
+                        forwarded[index].append((line, mapping[position]))
+                        break
+                else:
+                    owners[line] = commit.hash
+            pending.extend((parent, moved) for (parent, _), moved in zip(parents, forwarded) if moved)
+        return [BlameLine(owner, number, text) for number, (owner, text) in enumerate(zip(owners, lines), 1)]
+
+    def blame_parents(self, path, commit, shallow, contents):
+        # For each parent, its nearest version of path and a map from line
+        # positions in commit's version to positions in that one.
+        lines = self.version_lines(path, commit, contents)
+        parents = []
+        for parent_hash in ([] if commit.hash in shallow else commit.parents):
+            parent = self.nearest_version(path, parent_hash)
+            if parent is None:
+                continue
+            matcher = SequenceMatcher(None, self.version_lines(path, parent, contents), lines, autojunk=False)
+            mapping = {}
+            for parent_start, current_start, size in matcher.get_matching_blocks():
+                for offset in range(size):
+                    mapping[current_start + offset] = parent_start + offset
+            parents.append((parent, mapping))
+        return parents
+
+    def version_lines(self, path, commit, contents):
+        if commit.hash not in contents:
+            contents[commit.hash] = self.storage.load_object(commit.tree.get(path).hex()).splitlines()
+        return contents[commit.hash]
+
+    def nearest_version(self, path, start):
+        # The first commit reachable from start whose tree records path.
+        for commit_hash, entry in self.walk_history(start, self.commit_graph.get):
+            if entry.bloom.might_contain(path):
+                commit = self.storage.load_commit(commit_hash)
+                if commit.tree.get(path) is not None:
+                    return commit
+        return None
+
+    def clone_from(self, source_dir, depth=None, partial=False):
+        if depth is not None and depth < 1:
+            raise ValueError(f"Clone depth must be at least 1, got {depth}.")
+        if any(self.storage.load_branch(branch) for branch in self.storage.list_branches()):
+            raise RepositoryNotEmptyError(self.repo_dir)
+        source = Storage(source_dir, create=False)
+        kept = set()
+        cut = {}
+        for branch in source.list_branches():
+            head = source.load_branch(branch)
+            for commit in self.walk_source(source, head, depth, cut):
+                kept.add(commit.hash)
+                self.storage.copy_object_from(source, commit.hash)
+                if not partial:
+                    for oid in commit.tree.oids:
+                        self.storage.copy_object_from(source, oid.hex())
+            self.storage.save_branch(branch, head)
+
+        # A commit cut on one branch may still be fully reachable via another.
+        shallow = {commit_hash for commit_hash, parents in cut.items()
+                   if any(parent not in kept for parent in parents)}
+        shallow |= source.load_shallow() & kept
+        self.storage.save_shallow(shallow)
+        if partial:
+            self.storage.save_mirror(source_dir)
+        with open(os.path.join(source_dir, 'HEAD'), 'r') as f:
+            self.set_current_branch(f.read().strip())
+        return kept
+
+    def walk_source(self, source, head, depth, cut):
+        # Breadth-first so every commit is reached at its smallest depth.
+        source_shallow = source.load_shallow()
+        seen = set()
+        pending = deque([(head, 1)])
+        while pending:
+            commit_hash, generation = pending.popleft()
+            if not commit_hash or commit_hash in seen:
+                continue
+            seen.add(commit_hash)
+            commit = source.load_commit(commit_hash)
+            yield commit
+            if commit_hash in source_shallow:
+                continue
+            if depth is not None and generation >= depth:
+                if commit.parents:
+                    cut[commit_hash] = commit.parents
+                continue
+            pending.extend((parent, generation + 1) for parent in commit.parents)
 
     def list_commits(self):
-        current_commit = self.get_latest_commit()
-        while current_commit:
-            commit = self.storage.load_commit(current_commit)
-            print(f"{current_commit} - {commit['message']}")
-            current_commit = commit.get('parent')
+        # Kept for callers of the old printing API; cli.py formats iter_commits.
+        for commit in self.iter_commits():
+            print(f"{commit.hash} - {commit.message}")
 
     def reset_to_commit(self, commit_hash):
         current_branch = self.get_current_branch()
         self.storage.save_branch(current_branch, commit_hash)
-        print(f"Branch '{current_branch}' reset to commit '{commit_hash}'")
+        return current_branch
+
+    def fsck(self, incremental=False, workers=None):
+        started = time.time()
+        since = self.load_fsck_checkpoint() if incremental else None
+        to_check = list(self.storage.list_objects(since))
+
+        # hashlib releases the GIL on large updates, so threads keep every
+        # core busy while rehashing without pickling object contents around.
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            results = list(zip(to_check, executor.map(self.check_object, to_check)))
+        corrupt = {obj_hash for obj_hash, state in results if state == 'corrupt'}
+        # Each missing object is reported once, against its first referrer.
+        missing = {obj_hash: "removed during fsck" for obj_hash, state in results if state == 'missing'}
+
+        shallow = self.storage.load_shallow()
+        reachable = set()
+        for path, file_hash in self.storage.get_staging_files().items():
+            reachable.add(file_hash)
+            if file_hash not in missing and not self.storage.can_fetch(file_hash):
+                missing[file_hash] = f"{path} in staging area"
+        pending = [(self.storage.load_branch(branch), f"branch '{branch}'")
+                   for branch in self.storage.list_branches()]
+        while pending:
+            commit_hash, referrer = pending.pop()
+            if not commit_hash or commit_hash in reachable:
+                continue
+            reachable.add(commit_hash)
+            if commit_hash in missing:
+                continue
+            if not self.storage.can_fetch(commit_hash):
+                missing[commit_hash] = referrer
+                continue
+            if commit_hash in corrupt:
+                continue
+            try:
+                commit = self.storage.load_commit(commit_hash)
+            except (zlib.error, ValueError, KeyError, struct.error):
+                corrupt.add(commit_hash)
+                continue
+            for path, oid in commit.tree.items():
+                file_hash = oid.hex()
+                if file_hash in reachable:
+                    continue
+                reachable.add(file_hash)
+                if file_hash not in missing and not self.storage.can_fetch(file_hash):
+                    missing[file_hash] = f"{path} in {commit_hash}"
+            if commit_hash not in shallow:
+                pending.extend((parent, f"parent of {commit_hash}") for parent in commit.parents)
+
+        unreached = sorted(obj_hash for obj_hash in self.storage.list_objects() if obj_hash not in reachable)
+        # An unreadable commit hides its files and parents, so nothing left
+        # over can be called dangling with confidence.
+        if corrupt & reachable:
+            dangling, unknown = [], unreached
+        else:
+            dangling, unknown = unreached, []
+        if not corrupt and not missing:
+            self.save_fsck_checkpoint(started)
+        return FsckReport(len(to_check), list(missing.items()), sorted(corrupt), dangling, unknown)
+
+    def check_object(self, obj_hash):
+        try:
+            return 'ok' if self.storage.verify_object(obj_hash) else 'corrupt'
+        except FileNotFoundError:
+            return 'missing'
+        except OSError:
+            return 'corrupt'
+
+    def load_fsck_checkpoint(self):
+        if not os.path.exists(self.fsck_checkpoint_file):
+            return None
+        with open(self.fsck_checkpoint_file, 'r') as f:
+            return float(f.read().strip())
+
+    def save_fsck_checkpoint(self, timestamp):
+        with open(self.fsck_checkpoint_file, 'w') as f:
+            f.write(repr(timestamp))
@@ -0,0 +1,144 @@
+import struct
+from bisect import bisect_left
+
+# Binary commit layout (all integers big-endian):
+#   MAGIC | parent_count:u8 | parent_count * parent:20 | message_len:u32 | message
+#   | entry_count:u32 then per entry, sorted by path: path_len:u16 | path | oid:20
+# The first parent is the branch the commit was made on; merges add the
+# merged head(s) after it.
+MAGIC = b'commit\x00\x01'
+OID_SIZE = 20
+
+_U8 = struct.Struct('>B')
+_U16 = struct.Struct('>H')
+_U32 = struct.Struct('>I')
+
+
+def to_oid(obj_hash):
+    if not obj_hash:
+        return None
+    return bytes.fromhex(obj_hash)
+
+
+def to_hex(oid):
+    if oid is None:
+        return None
+    return oid.hex()
+
+
+class Tree:
+    __slots__ = ('paths', 'oids')
+
+    def __init__(self, paths=(), oids=()):
+        self.paths = tuple(paths)
+        self.oids = tuple(oids)
+
+    @classmethod
+    def from_dict(cls, files):
+        paths = sorted(files)
+        return cls(paths, [to_oid(files[path]) for path in paths])
+
+    def to_dict(self):
+        return {path: oid.hex() for path, oid in zip(self.paths, self.oids)}
+
+    def items(self):
+        return zip(self.paths, self.oids)
+
+    def get(self, path, default=None):
+        index = bisect_left(self.paths, path)
+        if index < len(self.paths) and self.paths[index] == path:
+            return self.oids[index]
+        return default
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __eq__(self, other):
+        if not isinstance(other, Tree):
+            return NotImplemented
+        return self.paths == other.paths and self.oids == other.oids
+
+    def encode(self):
+        parts = [_U32.pack(len(self.paths))]
+        for path, oid in zip(self.paths, self.oids):
+            path_data = path.encode()
+            parts.append(_U16.pack(len(path_data)))
+            parts.append(path_data)
+            parts.append(oid)
+        return b''.join(parts)
+
+    @classmethod
+    def decode_from(cls, view, offset):
+        (count,) = _U32.unpack_from(view, offset)
+        offset += _U32.size
+        paths = []
+        oids = []
+        for _ in range(count):
+            (path_len,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            paths.append(str(view[offset:offset + path_len], 'utf-8'))
+            offset += path_len
+            oids.append(bytes(view[offset:offset + OID_SIZE]))
+            offset += OID_SIZE
+        return cls(paths, oids), offset
+
+
+class Commit:
+    __slots__ = ('oid', 'message', 'parent_oids', 'tree')
+
+    def __init__(self, message, parent_oids=(), tree=None, oid=None):
+        self.oid = oid
+        self.message = message
+        self.parent_oids = tuple(parent_oids)
+        self.tree = tree if tree is not None else Tree()
+
+    @classmethod
+    def from_dict(cls, data, obj_hash=None):
+        parent_oid = to_oid(data.get('parent'))
+        parent_oids = () if parent_oid is None else (parent_oid,)
+        return cls(data['message'], parent_oids, Tree.from_dict(data.get('files', {})), to_oid(obj_hash))
+
+    @property
+    def hash(self):
+        return to_hex(self.oid)
+
+    @property
+    def parents(self):
+        return [oid.hex() for oid in self.parent_oids]
+
+    @property
+    def parent(self):
+        return to_hex(self.parent_oids[0]) if self.parent_oids else None
+
+    @property
+    def files(self):
+        return self.tree.to_dict()
+
+    def encode(self):
+        message_data = self.message.encode()
+        parts = [MAGIC, _U8.pack(len(self.parent_oids))]
+        parts.extend(self.parent_oids)
+        parts.append(_U32.pack(len(message_data)))
+        parts.append(message_data)
+        parts.append(self.tree.encode())
+        return b''.join(parts)
+
+    @classmethod
+    def decode(cls, data, obj_hash=None):
+        view = memoryview(data)
+        offset = len(MAGIC)
+        (parent_count,) = _U8.unpack_from(view, offset)
+        offset += _U8.size
+        parent_oids = []
+        for _ in range(parent_count):
+            parent_oids.append(bytes(view[offset:offset + OID_SIZE]))
+            offset += OID_SIZE
+        (message_len,) = _U32.unpack_from(view, offset)
+        offset += _U32.size
+        message = str(view[offset:offset + message_len], 'utf-8')
+        offset += message_len
+        tree, _ = Tree.decode_from(view, offset)
+        return cls(message, parent_oids, tree, to_oid(obj_hash))
@@ -4,6 +4,10 @@ import argparse
 import json
 import stat
 import time
+from collections import namedtuple
+
+LogEntry = namedtuple('LogEntry', ['hash', 'message', 'timestamp'])
+DetailedCommit = namedtuple('DetailedCommit', ['hash', 'message', 'mode', 'size', 'timestamp'])
 
 # class SimpleVCS
 class SimpleVCS:
@@ -32,7 +36,7 @@ class SimpleVCS:
         commit_data = message.encode('utf-8')
         commit_hash = self.write_object(commit_data)
         self.log_commit(commit_hash, message)
-        print(f'Committed with hash {commit_hash}')
+        return commit_hash
 
     def log_commit(self, commit_hash, message):
         timestamp = time.time()
@@ -42,22 +46,28 @@ class SimpleVCS:
             f.seek(0)
             json.dump(log, f)
 
-    def list_commits(self):
+    def iter_commits(self):
         with open(self.log_file, 'r') as f:
             log = json.load(f)
-            for entry in log:
-                print(f"{entry['hash']} - {entry['message']}")
+        for entry in log:
+            yield LogEntry(entry['hash'], entry['message'], entry.get('timestamp'))
 
-    def list_commits_detailed(self):
+    def iter_commits_detailed(self):
         with open(self.log_file, 'r') as f:
             log = json.load(f)
-            for entry in log:
-                commit_file = os.path.join(self.objects_dir, entry['hash'])
-                st = os.stat(commit_file)
-                mode = stat.filemode(st.st_mode)
-                size = st.st_size
-                mtime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['timestamp']))
-                print(f"{mode} {size} {mtime} {entry['hash']} - {entry['message']}")
+        for entry in log:
+            commit_file = os.path.join(self.objects_dir, entry['hash'])
+            st = os.stat(commit_file)
+            yield DetailedCommit(entry['hash'], entry['message'], stat.filemode(st.st_mode), st.st_size, entry['timestamp'])
+
+    def list_commits(self):
+        for commit in self.iter_commits():
+            print(f"{commit.hash} - {commit.message}")
+
+    def list_commits_detailed(self):
+        for commit in self.iter_commits_detailed():
+            mtime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(commit.timestamp))
+            print(f"{commit.mode} {commit.size} {mtime} {commit.hash} - {commit.message}")
 
     def add_file(self, file_path):
         if not os.path.isfile(file_path):
@@ -117,7 +127,8 @@ def main():
     elif args.command == 'commit':
         if args.message:
             vcs = SimpleVCS(args.repo_dir)
-            vcs.commit(args.message)
+            commit_hash = vcs.commit(args.message)
+            print(f'Committed with hash {commit_hash}')
         else:
             print("Commit message is required.")
 
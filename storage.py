@@ -1,14 +1,42 @@
 import os
 import hashlib
 import json
+import mmap
+import shutil
+import tempfile
 import zlib
+from contextlib import contextmanager
+from records import Commit, MAGIC
+from watcher import WatchJournal
+
+# Large blobs are stored uncompressed behind this marker so they can be
+# memory-mapped; zlib streams always start with 0x78 so the two never clash.
+RAW_MARKER = b'raw\x00'
+LARGE_OBJECT_THRESHOLD = 1 << 20
+CHUNK_SIZE = 1 << 16
+# Repository bookkeeping that lives next to the working files and must never
+# be staged or reported by status.
+INTERNAL_NAMES = {'HEAD', 'objects', 'branches', 'staging', 'watch', 'commit-graph',
+                  'fsck_checkpoint', 'shallow', 'mirror'}
+
+class RepositoryNotFoundError(Exception):
+    pass
 
 class Storage:
-    def __init__(self, repo_dir):
+    def __init__(self, repo_dir, create=True):
         self.repo_dir = repo_dir
         self.objects_dir = os.path.join(repo_dir, 'objects')
         self.branches_dir = os.path.join(repo_dir, 'branches')
         self.staging_area = os.path.join(repo_dir, 'staging')
+        self.shallow_file = os.path.join(repo_dir, 'shallow')
+        self.mirror_file = os.path.join(repo_dir, 'mirror')
+        self.watch = WatchJournal(repo_dir)
+        self.mirror = None
+        self.mirror_loaded = False
+        if not create:
+            if not os.path.isdir(self.objects_dir) or not os.path.isdir(self.branches_dir):
+                raise RepositoryNotFoundError(f"'{repo_dir}' is not a repository.")
+            return
         os.makedirs(self.objects_dir, exist_ok=True)
         os.makedirs(self.branches_dir, exist_ok=True)
         os.makedirs(self.staging_area, exist_ok=True)
@@ -22,27 +50,234 @@ class Storage:
         return obj_hash
 
     def load_object(self, obj_hash):
-        obj_path = os.path.join(self.objects_dir, obj_hash)
+        return self.load_object_bytes(obj_hash).decode()
+
+    def load_object_bytes(self, obj_hash):
+        obj_path = self.fetch_object(obj_hash)
         with open(obj_path, 'rb') as f:
             compressed_data = f.read()
-        return self.decompress_data(compressed_data)
+        if compressed_data.startswith(RAW_MARKER):
+            return compressed_data[len(RAW_MARKER):]
+        return zlib.decompress(compressed_data)
+
+    def object_path(self, obj_hash):
+        return os.path.join(self.objects_dir, obj_hash)
+
+    def has_object(self, obj_hash):
+        return os.path.exists(self.object_path(obj_hash))
+
+    def fetch_object(self, obj_hash):
+        # In a partial repository, objects that were not copied locally are
+        # pulled from the mirror the first time they are read.
+        obj_path = self.object_path(obj_hash)
+        if os.path.exists(obj_path):
+            return obj_path
+        mirror = self.load_mirror()
+        if mirror is not None and mirror.can_fetch(obj_hash):
+            self.copy_object_from(mirror, obj_hash)
+        return obj_path
+
+    def can_fetch(self, obj_hash):
+        if self.has_object(obj_hash):
+            return True
+        mirror = self.load_mirror()
+        return mirror is not None and mirror.can_fetch(obj_hash)
+
+    def copy_object_from(self, source, obj_hash):
+        obj_path = self.object_path(obj_hash)
+        if os.path.exists(obj_path):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out, open(source.fetch_object(obj_hash), 'rb') as f:
+                shutil.copyfileobj(f, out, CHUNK_SIZE)
+            os.replace(tmp_path, obj_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def load_mirror(self):
+        # Resolved once per Storage: fsck asks for every file of every commit.
+        if not self.mirror_loaded:
+            if os.path.exists(self.mirror_file):
+                with open(self.mirror_file, 'r') as f:
+                    mirror_dir = f.read().strip()
+                try:
+                    self.mirror = Storage(mirror_dir, create=False)
+                except RepositoryNotFoundError:
+                    raise RepositoryNotFoundError(
+                        f"Configured mirror '{mirror_dir}' is not a repository.") from None
+            self.mirror_loaded = True
+        return self.mirror
+
+    def save_mirror(self, mirror_dir):
+        with open(self.mirror_file, 'w') as f:
+            f.write(os.path.abspath(mirror_dir))
+        self.mirror_loaded = False
+
+    def load_shallow(self):
+        if not os.path.exists(self.shallow_file):
+            return set()
+        with open(self.shallow_file, 'r') as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def save_shallow(self, commit_hashes):
+        if not commit_hashes:
+            if os.path.exists(self.shallow_file):
+                os.remove(self.shallow_file)
+            return
+        with open(self.shallow_file, 'w') as f:
+            for commit_hash in sorted(commit_hashes):
+                f.write(f'{commit_hash}\n')
+
+    def list_objects(self, since=None):
+        with os.scandir(self.objects_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if since is not None and entry.stat().st_mtime < since:
+                    continue
+                yield entry.name
+
+    def verify_object(self, obj_hash):
+        sha1 = hashlib.sha1()
+        with open(self.object_path(obj_hash), 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest() == obj_hash
+
+    def list_branches(self):
+        return sorted(os.listdir(self.branches_dir))
+
+    def hash_file(self, file_path):
+        if os.path.getsize(file_path) < LARGE_OBJECT_THRESHOLD:
+            with open(file_path, 'rb') as f:
+                return self.hash_data(self.compress_data(f.read()))
+        sha1 = hashlib.sha1(RAW_MARKER)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def file_matches(self, file_path, obj_hash):
+        if self.hash_file(file_path) == obj_hash:
+            return True
+        # Before large blobs were stored raw every object was sha1(zlib(data)),
+        # so an unchanged large file tracked by an older commit has that id.
+        if os.path.getsize(file_path) < LARGE_OBJECT_THRESHOLD:
+            return False
+        if self.has_object(obj_hash) and self.stored_raw(obj_hash):
+            return False
+        sha1 = hashlib.sha1()
+        compressor = zlib.compressobj()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha1.update(compressor.compress(chunk))
+        sha1.update(compressor.flush())
+        return sha1.hexdigest() == obj_hash
+
+    def stored_raw(self, obj_hash):
+        with open(self.object_path(obj_hash), 'rb') as f:
+            return f.read(len(RAW_MARKER)) == RAW_MARKER
+
+    def save_file(self, file_path):
+        if os.path.getsize(file_path) < LARGE_OBJECT_THRESHOLD:
+            with open(file_path, 'rb') as f:
+                return self.save_object(f.read())
+        sha1 = hashlib.sha1(RAW_MARKER)
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out, open(file_path, 'rb') as f:
+                out.write(RAW_MARKER)
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    sha1.update(chunk)
+                    out.write(chunk)
+            obj_hash = sha1.hexdigest()
+            os.replace(tmp_path, self.object_path(obj_hash))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return obj_hash
+
+    @contextmanager
+    def open_blob(self, obj_hash):
+        # Raw objects are mapped without copying; compressed ones have to be
+        # inflated, so use iter_blob for those when memory matters. The view
+        # is only valid inside the with block: copy anything needed later
+        # with bytes(). A slice that does outlive the block keeps the mapping
+        # alive until it is garbage collected instead of failing on close.
+        with open(self.fetch_object(obj_hash), 'rb') as f:
+            if f.read(len(RAW_MARKER)) != RAW_MARKER:
+                f.seek(0)
+                view = memoryview(zlib.decompress(f.read()))
+                try:
+                    yield view
+                finally:
+                    view.release()
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)[len(RAW_MARKER):]
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+
+    def iter_blob(self, obj_hash, chunk_size=CHUNK_SIZE):
+        with open(self.fetch_object(obj_hash), 'rb') as f:
+            raw = f.read(len(RAW_MARKER)) == RAW_MARKER
+            if not raw:
+                f.seek(0)
+                decompressor = zlib.decompressobj()
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                if raw:
+                    yield chunk
+                    continue
+                data = decompressor.decompress(chunk, chunk_size)
+                while data:
+                    yield data
+                    data = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+            if not raw:
+                tail = decompressor.flush()
+                if tail:
+                    yield tail
+                if not decompressor.eof:
+                    raise zlib.error(f"Object {obj_hash} is truncated.")
+
+    def copy_blob(self, obj_hash, out):
+        size = 0
+        for chunk in self.iter_blob(obj_hash):
+            out.write(chunk)
+            size += len(chunk)
+        return size
 
     def hash_data(self, data):
         return hashlib.sha1(data).hexdigest()
 
     def compress_data(self, data):
-        return zlib.compress(data.encode())
+        if isinstance(data, str):
+            data = data.encode()
+        return zlib.compress(data)
 
     def decompress_data(self, data):
         return zlib.decompress(data).decode()
 
     def save_commit(self, commit):
-        commit_data = json.dumps(commit)
-        return self.save_object(commit_data)
+        if isinstance(commit, dict):
+            commit = Commit.from_dict(commit)
+        commit_hash = self.save_object(commit.encode())
+        commit.oid = bytes.fromhex(commit_hash)
+        return commit_hash
 
     def load_commit(self, commit_hash):
-        commit_data = self.load_object(commit_hash)
-        return json.loads(commit_data)
+        commit_data = self.load_object_bytes(commit_hash)
+        if commit_data.startswith(MAGIC):
+            return Commit.decode(commit_data, commit_hash)
+        # Commits written before the binary format are JSON.
+        return Commit.from_dict(json.loads(commit_data), commit_hash)
 
     def save_branch(self, branch_name, commit_hash):
         branch_path = os.path.join(self.branches_dir, branch_name)
@@ -51,21 +286,40 @@ class Storage:
 
     def load_branch(self, branch_name):
         branch_path = os.path.join(self.branches_dir, branch_name)
+        if not os.path.exists(branch_path):
+            return ''
         with open(branch_path, 'r') as f:
             return f.read().strip()
 
-    def add_to_staging(self, files):
-        if files == '.':
-            files = os.listdir(self.repo_dir)
+    def list_working_files(self):
+        return [name for name in os.listdir(self.repo_dir)
+                if name not in INTERNAL_NAMES and os.path.isfile(os.path.join(self.repo_dir, name))]
+
+    def add_to_staging(self, files, state=None):
+        # state is the (branch, head) pair the watch journal was built
+        # against; without it the watcher's dirty set cannot be trusted.
+        position = self.watch.journal_position()
+        dirty = self.watch.dirty_paths(state)
+        full_scan = files == '.' and dirty is None
+        if full_scan:
+            files = self.list_working_files()
+        elif files == '.':
+            # With a running watcher only the paths it saw change are read.
+            files = sorted(dirty)
+        staged = {}
         for file in files:
             file_path = os.path.join(self.repo_dir, file)
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    file_data = f.read()
-                file_hash = self.save_object(file_data)
+            if os.path.isfile(file_path):
+                file_hash = self.save_file(file_path)
                 staging_file_path = os.path.join(self.staging_area, file)
                 with open(staging_file_path, 'w') as f:
                     f.write(file_hash)
+                staged[file] = file_hash
+        if full_scan:
+            self.watch.mark_scanned(position, set(), state)
+        elif dirty is not None:
+            self.watch.save_dirty(dirty - set(files))
+        return staged
 
     def get_staging_files(self):
         staging_files = {}
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from core import SimpleVCS, RepositoryNotEmptyError
+
+
+def commit_file(vcs, name, content, message):
+    with open(os.path.join(vcs.repo_dir, name), 'w') as f:
+        f.write(content)
+    vcs.add([name])
+    return vcs.commit(message)
+
+
+@pytest.fixture
+def source(tmp_path):
+    # main: c1 - c2 - c3 - c4, feat branches off c2 with f1.
+    vcs = SimpleVCS(str(tmp_path / 'source'))
+    commits = [commit_file(vcs, 'a.txt', 'one\n', 'c1'), commit_file(vcs, 'a.txt', 'two\n', 'c2')]
+    vcs.create_branch('feat')
+    commits += [commit_file(vcs, 'a.txt', 'three\n', 'c3'), commit_file(vcs, 'a.txt', 'four\n', 'c4')]
+    vcs.checkout('feat')
+    commits.append(commit_file(vcs, 'b.txt', 'feat\n', 'f1'))
+    vcs.checkout('main')
+    return vcs, [commit.hash for commit in commits]
+
+
+def test_full_clone_copies_everything(tmp_path, source):
+    src, hashes = source
+    clone = SimpleVCS(str(tmp_path / 'clone'))
+    assert clone.clone_from(src.repo_dir) == set(hashes)
+    assert clone.storage.load_shallow() == set()
+    assert sorted(clone.storage.list_objects()) == sorted(src.storage.list_objects())
+    assert clone.get_current_branch() == 'main'
+
+
+def test_shallow_clone_cuts_history(tmp_path, source):
+    src, (c1, c2, c3, c4, f1) = source
+    clone = SimpleVCS(str(tmp_path / 'clone'))
+    assert clone.clone_from(src.repo_dir, depth=1) == {c4, f1}
+    assert clone.storage.load_shallow() == {c4, f1}
+    assert not clone.storage.has_object(c3)
+    assert [commit.hash for commit in clone.iter_commits()] == [c4]
+
+
+def test_shallow_markers_merge_across_branches(tmp_path, source):
+    src, (c1, c2, c3, c4, f1) = source
+    clone = SimpleVCS(str(tmp_path / 'clone'))
+    # main alone would cut at c3, but feat reaches c2, so only c2 is a boundary.
+    assert clone.clone_from(src.repo_dir, depth=2) == {c2, c3, c4, f1}
+    assert clone.storage.load_shallow() == {c2}
+    assert [commit.hash for commit in clone.iter_commits()] == [c4, c3, c2]
+    assert clone.fsck().missing == []
+
+
+def test_clone_of_shallow_clone_keeps_boundary(tmp_path, source):
+    src, (c1, c2, c3, c4, f1) = source
+    first = SimpleVCS(str(tmp_path / 'first'))
+    first.clone_from(src.repo_dir, depth=2)
+    second = SimpleVCS(str(tmp_path / 'second'))
+    assert second.clone_from(first.repo_dir) == {c2, c3, c4, f1}
+    assert second.storage.load_shallow() == {c2}
+
+
+def test_partial_clone_fetches_blobs_lazily(tmp_path, source):
+    src, (c1, c2, c3, c4, f1) = source
+    clone = SimpleVCS(str(tmp_path / 'clone'))
+    clone.clone_from(src.repo_dir, partial=True)
+    blob = clone.storage.load_commit(c4).files['a.txt']
+    assert not clone.storage.has_object(blob)
+    assert clone.storage.can_fetch(blob)
+
+    assert clone.storage.load_object(blob) == 'four\n'
+    assert clone.storage.has_object(blob)
+    assert clone.fsck().missing == []
+
+
+def test_clone_refuses_repository_with_commits(tmp_path, source):
+    src, hashes = source
+    clone = SimpleVCS(str(tmp_path / 'clone'))
+    commit_file(clone, 'mine.txt', 'local\n', 'local')
+    head = clone.get_latest_commit()
+    with pytest.raises(RepositoryNotEmptyError):
+        clone.clone_from(src.repo_dir)
+    assert clone.get_latest_commit() == head
+    assert clone.storage.list_branches() == ['main']
+
+
+@pytest.mark.parametrize('depth', [0, -1])
+def test_clone_rejects_depth_below_one(tmp_path, source, depth):
+    src, hashes = source
+    clone = SimpleVCS(str(tmp_path / 'clone'))
+    with pytest.raises(ValueError):
+        clone.clone_from(src.repo_dir, depth=depth)
+    assert list(clone.storage.list_objects()) == []
@@ -0,0 +1,135 @@
+import os
+
+from commit_graph import BloomFilter, CommitGraph, MAX_INDEXED_PATHS
+from core import SimpleVCS
+from records import Commit, Tree, to_oid
+
+
+def write(vcs, name, content):
+    with open(os.path.join(vcs.repo_dir, name), 'w') as f:
+        f.write(content)
+
+
+def commit_file(vcs, name, content, message):
+    write(vcs, name, content)
+    vcs.add([name])
+    return vcs.commit(message)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    paths = [f'dir{i % 7}/file{i}.txt' for i in range(300)] + ['résumé.txt', '日本語.md']
+    bloom = BloomFilter.from_paths(paths)
+    assert all(bloom.might_contain(path) for path in paths)
+
+
+def test_bloom_filter_rejects_most_other_paths():
+    bloom = BloomFilter.from_paths(f'file{i}.txt' for i in range(100))
+    false_positives = sum(bloom.might_contain(f'other{i}.txt') for i in range(1000))
+    assert false_positives < 100
+
+
+def test_unindexed_bloom_filter_matches_everything():
+    bloom = BloomFilter.from_paths(f'file{i}' for i in range(MAX_INDEXED_PATHS + 1))
+    assert bloom.might_contain('anything')
+
+
+def test_commit_graph_survives_reload(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    first = commit_file(vcs, 'a.txt', 'one\n', 'first')
+    second = commit_file(vcs, 'b.txt', 'two\n', 'second')
+    graph = CommitGraph(vcs.storage)
+    entry = graph.get(second.hash)
+    assert entry.parents == [first.hash]
+    assert entry.bloom.might_contain('b.txt')
+    assert graph.get(first.hash).parents == []
+
+
+def test_log_path_only_lists_commits_touching_it(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    first = commit_file(vcs, 'a.txt', 'one\n', 'first')
+    commit_file(vcs, 'b.txt', 'other\n', 'unrelated')
+    third = commit_file(vcs, 'a.txt', 'two\n', 'third')
+    assert [commit.hash for commit in vcs.iter_path_commits('a.txt')] == [third.hash, first.hash]
+
+
+def test_blame_attributes_insertions_and_deletions(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    first = commit_file(vcs, 'f.txt', 'a\nb\nc\nd\n', 'first')
+    commit_file(vcs, 'g.txt', 'unrelated\n', 'other')
+    # Insert a line after 'a' and delete 'c'.
+    second = commit_file(vcs, 'f.txt', 'a\nnew\nb\nd\n', 'second')
+    # Append a line and delete 'a'.
+    third = commit_file(vcs, 'f.txt', 'new\nb\nd\nend\n', 'third')
+
+    blame = vcs.blame('f.txt')
+    assert [line.text for line in blame] == ['new', 'b', 'd', 'end']
+    assert [line.commit for line in blame] == [second.hash, first.hash, first.hash, third.hash]
+    assert [line.line_number for line in blame] == [1, 2, 3, 4]
+
+
+def test_blame_follows_merged_branch(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    commit_file(vcs, 'a.txt', 'base\n', 'base')
+    vcs.create_branch('feat')
+    vcs.checkout('feat')
+    feat = commit_file(vcs, 'h.txt', 'from feat\n', 'feat')
+    vcs.checkout('main')
+    commit_file(vcs, 'g.txt', 'from main\n', 'main')
+    vcs.merge('feat')
+
+    assert [commit.hash for commit in vcs.iter_path_commits('h.txt')] == [feat.hash]
+    assert [line.commit for line in vcs.blame('h.txt')] == [feat.hash]
+
+
+def save_merge(vcs, parents, name, content, message):
+    blob = vcs.storage.save_object(content.encode())
+    merge = Commit(message, [to_oid(parent.hash) for parent in parents], Tree.from_dict({name: blob}))
+    merge_hash = vcs.storage.save_commit(merge)
+    vcs.storage.save_branch(vcs.get_current_branch(), merge_hash)
+    return merge_hash
+
+
+def test_blame_credits_each_side_of_a_merge(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    base = commit_file(vcs, 'f.txt', 'a\nb\n', 'base')
+    vcs.create_branch('feat')
+    main = commit_file(vcs, 'f.txt', 'a\nb\nmain\n', 'main')
+    vcs.checkout('feat')
+    feat = commit_file(vcs, 'f.txt', 'a\nb\nc\n', 'feat')
+    vcs.checkout('main')
+    merge = save_merge(vcs, [main, feat], 'f.txt', 'a\nb\nmain\nc\nfix\n', 'merge')
+
+    blame = vcs.blame('f.txt')
+    assert [line.text for line in blame] == ['a', 'b', 'main', 'c', 'fix']
+    assert [line.commit for line in blame] == [base.hash, base.hash, main.hash, feat.hash, merge]
+
+
+def test_blame_diffs_against_own_ancestors(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    base = commit_file(vcs, 'f.txt', 'a\nb\n', 'base')
+    vcs.create_branch('feat')
+    # main edits f.txt, then moves on, so its head does not record f.txt.
+    commit_file(vcs, 'f.txt', 'a\nx\n', 'edit')
+    commit_file(vcs, 'g.txt', 'other\n', 'other')
+    vcs.checkout('feat')
+    feat = commit_file(vcs, 'f.txt', 'a\nb\nc\n', 'append')
+    vcs.checkout('main')
+    assert vcs.merge('feat').conflicts == []
+
+    blame = vcs.blame('f.txt')
+    assert [line.text for line in blame] == ['a', 'b', 'c']
+    assert [line.commit for line in blame] == [base.hash, base.hash, feat.hash]
+
+
+def test_blame_in_shallow_partial_clone_stays_local(tmp_path):
+    source = SimpleVCS(str(tmp_path / 'source'))
+    commit_file(source, 'f.txt', 'a\n', 'first')
+    second = commit_file(source, 'f.txt', 'a\nb\n', 'second')
+    clone = SimpleVCS(str(tmp_path / 'clone'))
+    clone.clone_from(source.repo_dir, depth=1, partial=True)
+
+    blame = clone.blame('f.txt')
+    assert [line.commit for line in blame] == [second.hash, second.hash]
+    assert not clone.storage.has_object(second.parent)
+    report = clone.fsck()
+    assert (report.missing, report.dangling) == ([], [])
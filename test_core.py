@@ -0,0 +1,132 @@
+import os
+
+import pytest
+
+from core import SimpleVCS, BranchNotFoundError, MergeResult
+from records import Commit
+import simple_vcs
+
+
+def write(vcs, name, content):
+    with open(os.path.join(vcs.repo_dir, name), 'w') as f:
+        f.write(content)
+
+
+def test_init_and_branch_return_values(tmp_path):
+    repo_dir = str(tmp_path / 'repo')
+    vcs = SimpleVCS(repo_dir)
+    assert vcs.init_repo() is False
+    assert vcs.create_branch('dev') is True
+    assert vcs.create_branch('dev') is False
+    assert vcs.get_current_branch() == 'main'
+
+
+def test_construction_prints_nothing(tmp_path, capsys):
+    SimpleVCS(str(tmp_path))
+    SimpleVCS(str(tmp_path))
+    assert capsys.readouterr().out == ''
+
+
+def test_add_and_commit_return_records(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    write(vcs, 'a.txt', 'one\n')
+    staged = vcs.add(['a.txt', 'missing.txt'])
+    assert list(staged) == ['a.txt']
+
+    commit = vcs.commit('first')
+    assert isinstance(commit, Commit)
+    assert commit.hash == vcs.get_latest_commit()
+    assert commit.message == 'first'
+    assert commit.parents == []
+    assert commit.files == staged
+
+
+def test_add_dot_skips_repository_files(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    write(vcs, 'a.txt', 'one\n')
+    assert list(vcs.add('.')) == ['a.txt']
+
+
+def test_iter_commits_is_lazy_and_newest_first(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    hashes = []
+    for i in range(5):
+        write(vcs, 'a.txt', f'{i}\n')
+        vcs.add(['a.txt'])
+        hashes.append(vcs.commit(f'c{i}').hash)
+
+    commits = vcs.iter_commits()
+    assert next(commits).hash == hashes[-1]
+    assert [commit.message for commit in vcs.iter_commits()] == ['c4', 'c3', 'c2', 'c1', 'c0']
+
+
+def test_merge_returns_result_with_both_parents(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    write(vcs, 'a.txt', 'base\n')
+    vcs.add(['a.txt'])
+    vcs.commit('base')
+    vcs.create_branch('feat')
+    vcs.checkout('feat')
+    write(vcs, 'h.txt', 'feat\n')
+    vcs.add(['h.txt'])
+    feat = vcs.commit('feat')
+    vcs.checkout('main')
+    write(vcs, 'g.txt', 'main\n')
+    vcs.add(['g.txt'])
+    main = vcs.commit('main')
+
+    result = vcs.merge('feat')
+    assert isinstance(result, MergeResult)
+    assert result.conflicts == []
+    assert (result.source, result.target) == ('feat', 'main')
+    merged = vcs.storage.load_commit(result.commit)
+    assert merged.parents == [main.hash, feat.hash]
+    assert feat.hash in [commit.hash for commit in vcs.iter_commits()]
+
+
+def test_merge_reports_conflicts(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    vcs.create_branch('feat')
+    write(vcs, 'a.txt', 'main\n')
+    vcs.add(['a.txt'])
+    vcs.commit('main')
+    vcs.checkout('feat')
+    write(vcs, 'a.txt', 'feat\n')
+    vcs.add(['a.txt'])
+    vcs.commit('feat')
+    vcs.checkout('main')
+
+    result = vcs.merge('feat')
+    assert result.commit is None
+    assert result.conflicts == ['Conflict at a.txt']
+
+
+def test_unknown_branch_raises(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    with pytest.raises(BranchNotFoundError) as excinfo:
+        vcs.merge('nope')
+    assert excinfo.value.branch_name == 'nope'
+    with pytest.raises(BranchNotFoundError):
+        vcs.checkout('nope')
+    assert vcs.get_current_branch() == 'main'
+
+
+def test_reset_returns_branch(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    write(vcs, 'a.txt', 'one\n')
+    vcs.add(['a.txt'])
+    first = vcs.commit('first')
+    vcs.add(['a.txt'])
+    vcs.commit('second')
+    assert vcs.reset_to_commit(first.hash) == 'main'
+    assert vcs.get_latest_commit() == first.hash
+
+
+def test_simple_vcs_iter_commits_yields_records(tmp_path):
+    vcs = simple_vcs.SimpleVCS(str(tmp_path))
+    commit_hash = vcs.commit('Initial commit')
+    entries = list(vcs.iter_commits())
+    assert entries == [simple_vcs.LogEntry(commit_hash, 'Initial commit', entries[0].timestamp)]
+    detailed = list(vcs.iter_commits_detailed())
+    assert detailed[0].hash == commit_hash
+    assert detailed[0].size == len('Initial commit')
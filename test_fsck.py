@@ -0,0 +1,102 @@
+import os
+import time
+
+from core import SimpleVCS
+
+
+def commit_file(vcs, name, content, message):
+    with open(os.path.join(vcs.repo_dir, name), 'w') as f:
+        f.write(content)
+    vcs.add([name])
+    return vcs.commit(message)
+
+
+def file_hash(commit, name):
+    return commit.files[name]
+
+
+def test_clean_repository(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    commit_file(vcs, 'a.txt', 'one\n', 'first')
+    report = vcs.fsck()
+    assert report.checked > 0
+    assert (report.missing, report.corrupt, report.dangling, report.unknown) == ([], [], [], [])
+
+
+def test_missing_blob_reported_once(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    first = commit_file(vcs, 'a.txt', 'one\n', 'first')
+    commit_file(vcs, 'b.txt', 'two\n', 'second')
+    # Restaging the unchanged file makes two commits reference the blob.
+    vcs.add(['a.txt'])
+    third = vcs.commit('third')
+    blob = file_hash(first, 'a.txt')
+    assert file_hash(third, 'a.txt') == blob
+    os.remove(vcs.storage.object_path(blob))
+
+    report = vcs.fsck()
+    assert [obj_hash for obj_hash, _ in report.missing] == [blob]
+    assert report.corrupt == []
+
+
+def test_corrupt_blob_and_unreadable_object(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    commit = commit_file(vcs, 'a.txt', 'one\n', 'first')
+    blob = file_hash(commit, 'a.txt')
+    with open(vcs.storage.object_path(blob), 'ab') as f:
+        f.write(b'garbage')
+    # Errors reading one object must not abort the whole check.
+    broken = 'f' * 40
+    os.mkdir(vcs.storage.object_path(broken))
+
+    report = vcs.fsck()
+    assert report.corrupt == sorted([blob, broken])
+    assert report.missing == []
+    assert not os.path.exists(vcs.fsck_checkpoint_file)
+
+
+def test_dangling_and_unknown_objects(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    commit = commit_file(vcs, 'a.txt', 'one\n', 'first')
+    orphan = vcs.storage.save_object(b'orphan')
+    assert vcs.fsck().dangling == [orphan]
+
+    # Once a reachable commit is unreadable its files cannot be traced, so
+    # unreached objects are no longer called dangling.
+    with open(vcs.storage.object_path(commit.hash), 'wb') as f:
+        f.write(b'not a commit')
+    report = vcs.fsck()
+    assert commit.hash in report.corrupt
+    assert report.dangling == []
+    assert report.unknown == sorted([orphan, file_hash(commit, 'a.txt')])
+
+
+def test_incremental_only_rehashes_new_objects(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    commit_file(vcs, 'a.txt', 'one\n', 'first')
+    past = time.time() - 60
+    for obj_hash in vcs.storage.list_objects():
+        os.utime(vcs.storage.object_path(obj_hash), (past, past))
+    assert vcs.fsck().corrupt == []
+    assert os.path.exists(vcs.fsck_checkpoint_file)
+
+    second = commit_file(vcs, 'b.txt', 'two\n', 'second')
+    report = vcs.fsck(incremental=True)
+    assert report.checked == 2
+    assert report.corrupt == []
+    assert file_hash(second, 'b.txt') in vcs.storage.list_objects()
+
+
+def test_missing_checkpoint_checks_everything(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    commit_file(vcs, 'a.txt', 'one\n', 'first')
+    total = len(list(vcs.storage.list_objects()))
+    assert vcs.fsck(incremental=True).checked == total
+
+
+def test_missing_branch_head(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    commit = commit_file(vcs, 'a.txt', 'one\n', 'first')
+    os.remove(vcs.storage.object_path(commit.hash))
+    report = vcs.fsck()
+    assert report.missing == [(commit.hash, "branch 'main'")]
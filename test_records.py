@@ -0,0 +1,89 @@
+import json
+
+from records import Commit, Tree, MAGIC, to_oid
+from storage import Storage
+
+PARENT = 'a' * 40
+OTHER_PARENT = 'b' * 40
+
+
+def round_trip(commit):
+    data = commit.encode()
+    assert data.startswith(MAGIC)
+    return Commit.decode(data, 'c' * 40)
+
+
+def test_round_trip_without_parent():
+    commit = Commit('initial', tree=Tree.from_dict({'a.txt': '1' * 40}))
+    decoded = round_trip(commit)
+    assert decoded.parent is None
+    assert decoded.parents == []
+    assert decoded.message == 'initial'
+    assert decoded.files == {'a.txt': '1' * 40}
+    assert decoded.hash == 'c' * 40
+
+
+def test_round_trip_with_parent():
+    commit = Commit('second', [to_oid(PARENT)], Tree.from_dict({'a.txt': '2' * 40}))
+    decoded = round_trip(commit)
+    assert decoded.parent == PARENT
+    assert decoded.parents == [PARENT]
+    assert decoded.files == {'a.txt': '2' * 40}
+
+
+def test_round_trip_with_several_parents():
+    commit = Commit('merge', [to_oid(PARENT), to_oid(OTHER_PARENT)])
+    decoded = round_trip(commit)
+    assert decoded.parent == PARENT
+    assert decoded.parents == [PARENT, OTHER_PARENT]
+
+
+def test_round_trip_non_ascii_paths_and_message():
+    files = {'résumé.txt': '3' * 40, '日本語.md': '4' * 40, 'plain.txt': '5' * 40}
+    commit = Commit('Ajout de la fonctionnalité ✓', [to_oid(PARENT)], Tree.from_dict(files))
+    decoded = round_trip(commit)
+    assert decoded.message == 'Ajout de la fonctionnalité ✓'
+    assert decoded.files == files
+    assert decoded.tree.get('日本語.md') == to_oid('4' * 40)
+
+
+def test_round_trip_empty_tree():
+    decoded = round_trip(Commit('empty', [to_oid(PARENT)]))
+    assert len(decoded.tree) == 0
+    assert decoded.files == {}
+    assert decoded.tree == Tree()
+
+
+def test_encoding_is_canonical():
+    first = Commit('m', tree=Tree.from_dict({'b': '1' * 40, 'a': '2' * 40}))
+    second = Commit('m', tree=Tree.from_dict({'a': '2' * 40, 'b': '1' * 40}))
+    assert first.encode() == second.encode()
+
+
+def test_storage_round_trip(tmp_path):
+    storage = Storage(str(tmp_path))
+    commit = Commit('stored', [to_oid(PARENT)], Tree.from_dict({'a.txt': '1' * 40}))
+    commit_hash = storage.save_commit(commit)
+    loaded = storage.load_commit(commit_hash)
+    assert loaded.hash == commit_hash
+    assert loaded.parent == PARENT
+    assert loaded.files == {'a.txt': '1' * 40}
+
+
+def test_load_legacy_json_commit(tmp_path):
+    storage = Storage(str(tmp_path))
+    legacy = {'message': 'old commit', 'parent': PARENT, 'files': {'a.txt': '1' * 40}}
+    commit_hash = storage.save_object(json.dumps(legacy))
+    loaded = storage.load_commit(commit_hash)
+    assert loaded.hash == commit_hash
+    assert loaded.message == 'old commit'
+    assert loaded.parents == [PARENT]
+    assert loaded.files == {'a.txt': '1' * 40}
+
+
+def test_load_legacy_json_root_commit(tmp_path):
+    storage = Storage(str(tmp_path))
+    commit_hash = storage.save_object(json.dumps({'message': 'root', 'parent': '', 'files': {}}))
+    loaded = storage.load_commit(commit_hash)
+    assert loaded.parent is None
+    assert loaded.parents == []
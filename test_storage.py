@@ -0,0 +1,106 @@
+import io
+import os
+import zlib
+
+import pytest
+
+import storage
+from core import SimpleVCS
+from storage import Storage, RAW_MARKER
+
+LARGE = 4096
+
+
+@pytest.fixture
+def small_threshold(monkeypatch):
+    monkeypatch.setattr(storage, 'LARGE_OBJECT_THRESHOLD', LARGE)
+
+
+def write_bytes(repo_dir, name, data):
+    path = os.path.join(repo_dir, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_large_file_is_stored_raw(tmp_path, small_threshold):
+    store = Storage(str(tmp_path))
+    data = os.urandom(LARGE * 3)
+    obj_hash = store.save_file(write_bytes(str(tmp_path), 'big.bin', data))
+    assert store.stored_raw(obj_hash)
+    assert store.verify_object(obj_hash)
+    assert store.hash_file(os.path.join(str(tmp_path), 'big.bin')) == obj_hash
+
+    with store.open_blob(obj_hash) as view:
+        assert bytes(view) == data
+    assert b''.join(store.iter_blob(obj_hash, chunk_size=1000)) == data
+    out = io.BytesIO()
+    assert store.copy_blob(obj_hash, out) == len(data)
+    assert out.getvalue() == data
+    assert store.load_object_bytes(obj_hash) == data
+
+
+def test_small_file_is_stored_compressed(tmp_path, small_threshold):
+    store = Storage(str(tmp_path))
+    data = b'hello\n' * 500
+    obj_hash = store.save_file(write_bytes(str(tmp_path), 'small.txt', data))
+    assert not store.stored_raw(obj_hash)
+
+    with store.open_blob(obj_hash) as view:
+        assert bytes(view) == data
+    # Small chunks force the decompressor through its unconsumed_tail loop.
+    assert b''.join(store.iter_blob(obj_hash, chunk_size=16)) == data
+    out = io.BytesIO()
+    assert store.copy_blob(obj_hash, out) == len(data)
+    assert out.getvalue() == data
+
+
+def test_slice_outliving_open_blob(tmp_path, small_threshold):
+    store = Storage(str(tmp_path))
+    data = os.urandom(LARGE * 2)
+    obj_hash = store.save_file(write_bytes(str(tmp_path), 'big.bin', data))
+    with store.open_blob(obj_hash) as view:
+        head = view[:10]
+    assert bytes(head) == data[:10]
+    head.release()
+
+
+def test_truncated_compressed_object_raises(tmp_path):
+    store = Storage(str(tmp_path))
+    data = os.urandom(50000)
+    obj_hash = store.save_object(data)
+    path = store.object_path(obj_hash)
+    with open(path, 'rb') as f:
+        stored = f.read()
+    with open(path, 'wb') as f:
+        f.write(stored[:len(stored) // 2])
+
+    with pytest.raises(zlib.error):
+        b''.join(store.iter_blob(obj_hash))
+    with pytest.raises(zlib.error):
+        store.copy_blob(obj_hash, io.BytesIO())
+    with pytest.raises(zlib.error):
+        with store.open_blob(obj_hash):
+            pass
+
+
+def test_legacy_compressed_large_file_is_not_modified(tmp_path, small_threshold):
+    vcs = SimpleVCS(str(tmp_path))
+    data = os.urandom(LARGE * 2)
+    path = write_bytes(str(tmp_path), 'big.bin', data)
+    # Older versions compressed every object, whatever its size.
+    legacy_hash = vcs.storage.save_object(data)
+    assert not vcs.storage.file_matches(path, legacy_hash[::-1])
+    assert vcs.storage.file_matches(path, legacy_hash)
+
+    with open(os.path.join(vcs.storage.staging_area, 'big.bin'), 'w') as f:
+        f.write(legacy_hash)
+    vcs.commit('legacy')
+    assert vcs.status().modified == []
+
+    write_bytes(str(tmp_path), 'big.bin', data + b'x')
+    assert vcs.status().modified == ['big.bin']
+
+
+def test_raw_marker_never_starts_a_zlib_stream():
+    assert not zlib.compress(b'').startswith(RAW_MARKER)
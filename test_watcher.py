@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from core import SimpleVCS
+from storage import INTERNAL_NAMES
+from watcher import RESCAN, Watcher, WatchJournal
+
+STATE = ('main', 'a' * 40)
+
+
+def write(repo_dir, name, content):
+    with open(os.path.join(repo_dir, name), 'w') as f:
+        f.write(content)
+
+
+def read_journal(journal):
+    with open(journal.journal_file, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = WatchJournal(str(tmp_path))
+    journal.start_session()
+    # Nothing is trusted until a full scan has recorded its position.
+    assert journal.dirty_paths(STATE) is None
+    journal.mark_scanned(journal.journal_position(), set(), STATE)
+    return journal
+
+
+def test_dirty_paths_accumulate_and_compact(journal):
+    journal.append(['a.txt', 'b.txt', 'a.txt'])
+    assert journal.dirty_paths(STATE) == {'a.txt', 'b.txt'}
+    assert read_journal(journal) == b''
+    assert journal.load_cursor() == (journal.load_session(), 0, STATE)
+
+    # Paths not yet consumed by add or status carry over.
+    journal.append(['c.txt'])
+    assert journal.dirty_paths(STATE) == {'a.txt', 'b.txt', 'c.txt'}
+    journal.save_dirty({'c.txt'})
+    assert journal.dirty_paths(STATE) == {'c.txt'}
+
+
+def test_partial_line_is_left_for_later(journal):
+    with open(journal.journal_file, 'ab') as f:
+        f.write(b'done.txt\nhalf')
+    assert journal.dirty_paths(STATE) == {'done.txt'}
+    assert read_journal(journal) == b'half'
+    assert journal.journal_position() == (journal.load_session(), 0)
+
+    journal.append(['.txt'])
+    assert journal.dirty_paths(STATE) == {'done.txt', 'half.txt'}
+
+
+def test_journal_position_skips_partial_line(journal):
+    journal.append([f'file{i}.txt' for i in range(1000)])
+    size = len(read_journal(journal))
+    with open(journal.journal_file, 'ab') as f:
+        f.write(b'partial')
+    assert journal.journal_position() == (journal.load_session(), size)
+
+
+def test_rescan_marker_forces_full_scan(journal):
+    journal.append(['a.txt', RESCAN])
+    assert journal.dirty_paths(STATE) is None
+
+
+def test_moved_head_forces_full_scan(journal):
+    journal.append(['a.txt'])
+    assert journal.dirty_paths(('main', 'b' * 40)) is None
+    assert journal.dirty_paths(('feat', STATE[1])) is None
+    assert journal.dirty_paths(None) is None
+    assert journal.dirty_paths(STATE) == {'a.txt'}
+
+    journal.advance_head(STATE, ('main', 'b' * 40))
+    assert journal.dirty_paths(('main', 'b' * 40)) == {'a.txt'}
+    # Only a cursor still at the old head is moved.
+    journal.advance_head(STATE, ('main', 'c' * 40))
+    assert journal.dirty_paths(('main', 'c' * 40)) is None
+
+
+def test_new_or_ended_session_forces_full_scan(journal):
+    journal.start_session()
+    assert journal.dirty_paths(STATE) is None
+    journal.mark_scanned(journal.journal_position(), set(), STATE)
+    assert journal.dirty_paths(STATE) == set()
+    journal.end_session()
+    assert journal.dirty_paths(STATE) is None
+
+
+def test_old_cursor_format_forces_full_scan(journal):
+    with open(journal.cursor_file, 'w') as f:
+        f.write(f'{journal.load_session()} 0')
+    assert journal.load_cursor() == (None, 0, None)
+    assert journal.dirty_paths(STATE) is None
+
+
+def test_checkout_rescans_working_tree(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    write(vcs.repo_dir, 'a.txt', 'main\n')
+    vcs.add(['a.txt'])
+    vcs.commit('main')
+    vcs.create_branch('feat')
+    vcs.checkout('feat')
+    write(vcs.repo_dir, 'a.txt', 'feat\n')
+    vcs.add(['a.txt'])
+    vcs.commit('feat')
+    vcs.checkout('main')
+    write(vcs.repo_dir, 'a.txt', 'main\n')
+
+    vcs.storage.watch.start_session()
+    assert vcs.status().modified == []
+    # No file changed, but a.txt no longer matches the checked out head.
+    vcs.checkout('feat')
+    assert vcs.status().modified == ['a.txt']
+    vcs.reset_to_commit(vcs.storage.load_branch('main'))
+    assert vcs.status().modified == []
+
+
+def test_commit_keeps_incremental_mode(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    watch = vcs.storage.watch
+    watch.start_session()
+    assert vcs.status() == ([], [], [])
+
+    write(vcs.repo_dir, 'a.txt', 'one\n')
+    watch.append(['a.txt'])
+    # Written without an event, so only a full scan would find it.
+    write(vcs.repo_dir, 'unseen.txt', 'x\n')
+    assert list(vcs.add('.')) == ['a.txt']
+    commit = vcs.commit('first')
+    assert watch.load_cursor()[2] == ('main', commit.hash)
+    assert vcs.status() == ([], [], [])
+
+    write(vcs.repo_dir, 'a.txt', 'two\n')
+    watch.append(['a.txt'])
+    assert vcs.status().modified == ['a.txt']
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify is Linux only")
+def test_watcher_records_changes(tmp_path):
+    vcs = SimpleVCS(str(tmp_path))
+    watcher = Watcher(vcs.repo_dir, ignored=INTERNAL_NAMES)
+    threading.Thread(target=watcher.run, daemon=True).start()
+    deadline = time.time() + 5
+    while watcher.journal.load_session() is None and time.time() < deadline:
+        time.sleep(0.01)
+    vcs.status()
+
+    write(vcs.repo_dir, 'a.txt', 'one\n')
+    while b'a.txt' not in read_journal(watcher.journal) and time.time() < deadline:
+        time.sleep(0.01)
+    assert vcs.status().untracked == ['a.txt']
+    assert vcs.storage.watch.load_dirty() == {'a.txt'}
@@ -0,0 +1,226 @@
+import ctypes
+import ctypes.util
+import fcntl
+import os
+import struct
+import sys
+import uuid
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# A journal line holding only this marker means events were lost and the next
+# consumer has to fall back to a full scan.
+RESCAN = '!'
+
+_EVENT = struct.Struct('iIII')
+TAIL_CHUNK = 4096
+
+
+class Watcher:
+    def __init__(self, repo_dir, ignored=()):
+        self.repo_dir = repo_dir
+        self.ignored = set(ignored)
+        self.journal = WatchJournal(repo_dir)
+
+    def run(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("Watch mode requires inotify (Linux only).")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(0)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            if libc.inotify_add_watch(fd, os.fsencode(self.repo_dir), WATCH_MASK) < 0:
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            # A new session invalidates every cursor, so whatever happened
+            # while no watcher was running is caught by a full scan.
+            self.journal.start_session()
+            try:
+                while True:
+                    self.journal.append(self.read_events(fd))
+            finally:
+                self.journal.end_session()
+        finally:
+            os.close(fd)
+
+    def read_events(self, fd):
+        data = os.read(fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_len = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                names.append(RESCAN)
+            elif name and not mask & IN_ISDIR and name not in self.ignored:
+                names.append(name)
+        return names
+
+
+class WatchJournal:
+    def __init__(self, repo_dir):
+        self.watch_dir = os.path.join(repo_dir, 'watch')
+        self.session_file = os.path.join(self.watch_dir, 'session')
+        self.journal_file = os.path.join(self.watch_dir, 'journal')
+        self.cursor_file = os.path.join(self.watch_dir, 'cursor')
+        self.dirty_file = os.path.join(self.watch_dir, 'dirty')
+
+    def start_session(self):
+        os.makedirs(self.watch_dir, exist_ok=True)
+        with open(self.journal_file, 'w'):
+            pass
+        with open(self.session_file, 'w') as f:
+            f.write(f'{uuid.uuid4().hex} {os.getpid()}')
+
+    def end_session(self):
+        if os.path.exists(self.session_file):
+            os.remove(self.session_file)
+
+    def append(self, names):
+        if not names:
+            return
+        # The lock keeps appends from interleaving with compact().
+        with open(self.journal_file, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(''.join(f'{name}\n' for name in names))
+
+    def load_session(self):
+        if not os.path.exists(self.session_file):
+            return None
+        with open(self.session_file, 'r') as f:
+            session_id, pid = f.read().split()
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+        return session_id
+
+    def dirty_paths(self, state):
+        # Returns the paths changed since the last add, or None when the
+        # watcher is not running, missed events, or HEAD moved since the
+        # dirty set was built, and a full scan is needed. state is the
+        # (branch, head) pair the caller compares files against. Callers
+        # that fall back to a full scan report it via mark_scanned.
+        session_id = self.load_session()
+        if session_id is None or state is None:
+            return None
+        cursor_session, offset, cursor_state = self.load_cursor()
+        if cursor_session != session_id or cursor_state != state:
+            return None
+        with open(self.journal_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Only consume whole lines; a partially written one is read next time.
+        data = data[:data.rfind(b'\n') + 1]
+        names = set(os.fsdecode(data).splitlines())
+        if RESCAN in names:
+            return None
+        dirty = self.load_dirty() | names
+        self.save_dirty(dirty)
+        self.compact(session_id, offset + len(data), state)
+        return dirty
+
+    def journal_position(self):
+        # Taken before a full scan so events racing with the scan are
+        # replayed afterwards rather than lost.
+        session_id = self.load_session()
+        if session_id is None:
+            return None
+        with open(self.journal_file, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - TAIL_CHUNK)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    return session_id, start + newline + 1
+                end = start
+        return session_id, 0
+
+    def mark_scanned(self, position, dirty, state):
+        if position is None or state is None:
+            return
+        self.save_dirty(dirty)
+        self.compact(*position, state)
+
+    def advance_head(self, old_state, new_state):
+        # A commit records exactly the staged versions, so files that were
+        # clean against the old head stay clean against the new one.
+        session_id, offset, state = self.load_cursor()
+        if session_id is not None and state == old_state:
+            self.save_cursor(session_id, offset, new_state)
+
+    def compact(self, session_id, offset, state):
+        # Drop the consumed head of the journal so it stays proportional to
+        # the events not yet seen rather than to the session's lifetime.
+        with open(self.journal_file, 'r+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if offset:
+                f.seek(offset)
+                tail = f.read()
+                f.seek(0)
+                f.write(tail)
+                f.truncate()
+            self.save_cursor(session_id, 0, state)
+
+    def load_tracked(self, head):
+        # Last committed version of each path looked up by status, valid for
+        # one branch head; None marks a path no commit has recorded.
+        tracked_file = os.path.join(self.watch_dir, 'tracked')
+        if not os.path.exists(tracked_file):
+            return {}
+        with open(tracked_file, 'r') as f:
+            if f.readline().rstrip('\n') != head:
+                return {}
+            tracked = {}
+            for line in f:
+                path, _, obj_hash = line.rstrip('\n').rpartition('\t')
+                tracked[path] = obj_hash or None
+        return tracked
+
+    def save_tracked(self, head, tracked):
+        if not os.path.isdir(self.watch_dir):
+            return
+        with open(os.path.join(self.watch_dir, 'tracked'), 'w') as f:
+            f.write(f'{head}\n')
+            f.write(''.join(f'{path}\t{obj_hash or ""}\n' for path, obj_hash in sorted(tracked.items())))
+
+    def load_cursor(self):
+        # One field per line: session, offset, branch and head commit.
+        if not os.path.exists(self.cursor_file):
+            return None, 0, None
+        with open(self.cursor_file, 'r') as f:
+            fields = f.read().split('\n')
+        if len(fields) != 4:
+            return None, 0, None
+        session_id, offset, branch, head = fields
+        return session_id, int(offset), (branch, head)
+
+    def save_cursor(self, session_id, offset, state):
+        branch, head = state
+        with open(self.cursor_file, 'w') as f:
+            f.write(f'{session_id}\n{offset}\n{branch}\n{head}')
+
+    def load_dirty(self):
+        if not os.path.exists(self.dirty_file):
+            return set()
+        with open(self.dirty_file, 'r') as f:
+            return {line.rstrip('\n') for line in f if line.strip()}
+
+    def save_dirty(self, paths):
+        if not os.path.isdir(self.watch_dir):
+            return
+        with open(self.dirty_file, 'w') as f:
+            f.write(''.join(f'{path}\n' for path in sorted(paths)))